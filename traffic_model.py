@@ -1,61 +1,105 @@
-import networkx as nx
 import numpy as np
 
 class TrafficNetwork:
-    def __init__(self):
-        self.graph = nx.DiGraph()
+    def __init__(self, max_intersections=16):
         self.intersections = []
-        self.queue_lengths = {}
+        # [PERFORMANCE] Queue lengths live in one (N, 4) array with columns
+        # [N, S, E, W] instead of a dict per lane; throughput and stats
+        # become vectorized reads instead of per-lane lookups.
+        self._Q = np.zeros((max_intersections, 4), dtype=np.float32)
+        self._row = {}         # intersection_id -> row in _Q
+        self._lane_index = {}  # lane name -> (row, col) in _Q
         self.straight_fraction = 0.7
+        # [PERFORMANCE] Throughput of mode m is a fixed linear combination
+        # of the [N, S, E, W] queues, so encode all six modes as one 6x4
+        # coefficient matrix and replace the mode branch with a dot product.
+        f = self.straight_fraction
+        self._mode_coeff = np.array([
+            [f,     f,     0,     0    ],  # 1: NS straight
+            [1 - f, 1 - f, 0,     0    ],  # 2: NS turns
+            [0,     0,     f,     f    ],  # 3: EW straight
+            [0,     0,     1 - f, 1 - f],  # 4: EW turns
+            [1,     0,     0,     0    ],  # 5: N only
+            [0,     0,     1,     0    ],  # 6: E only
+        ], dtype=np.float32)
+        # [PERFORMANCE] History lives in preallocated NumPy buffers written
+        # by index (doubled when full) instead of Python lists - no
+        # per-step boxing, and the stats are already ndarrays when plotted.
         # [UPDATED] Added 'total_co2' to history
+        self._h_cap = 4096
         self.history = {
-            'step': [],
-            'total_congestion': [],
-            'queue_variance': [],
-            'total_co2': [] 
+            'step': np.empty(self._h_cap, np.int32),
+            'total_congestion': np.empty(self._h_cap, np.float32),
+            'queue_variance': np.empty(self._h_cap, np.float32),
+            'total_co2': np.empty(self._h_cap, np.float32)
         }
+        self._h_idx = 0
         self.step_count = 0
+        # [PERFORMANCE] Running sum / sum-of-squares over all lanes so the
+        # per-step total and variance never re-scan the whole array; each
+        # update costs O(lanes that actually changed).
+        self._sum = 0.0
+        self._sumsq = 0.0
 
     def create_intersection(self, intersection_id):
+        row = len(self.intersections)
+        if row >= self._Q.shape[0]:
+            self._Q = np.vstack([self._Q, np.zeros_like(self._Q)])
         self.intersections.append(intersection_id)
-        lanes = [f"N_{intersection_id}", f"S_{intersection_id}", 
-                 f"E_{intersection_id}", f"W_{intersection_id}"]
-        for lane in lanes:
-            self.graph.add_node(lane, type='lane')
-            self.queue_lengths[lane] = 0
+        self._row[intersection_id] = row
+        # [PERFORMANCE] No NetworkX graph: nothing ever read it, and node
+        # insertion costs a dict-of-dicts allocation per lane.
+        for col, direction in enumerate("NSEW"):
+            lane = f"{direction}_{intersection_id}"
+            self._lane_index[lane] = (row, col)
 
     def update_queues(self, new_queues, current_co2=0):
-        # Update current state
+        # Update current state, folding each change into the running sums
         for lane, cars in new_queues.items():
-            if lane in self.queue_lengths:
-                self.queue_lengths[lane] = cars
-        
+            idx = self._lane_index.get(lane)
+            if idx is not None:
+                old = float(self._Q[idx])
+                if cars != old:
+                    self._sum += cars - old
+                    self._sumsq += cars * cars - old * old
+                    self._Q[idx] = cars
+
         # Record Statistics
         self.step_count += 1
-        current_queues = list(self.queue_lengths.values())
-        total_cars = sum(current_queues)
-        variance = np.var(current_queues) if current_queues else 0
-        
-        self.history['step'].append(self.step_count)
-        self.history['total_congestion'].append(total_cars)
-        self.history['queue_variance'].append(variance)
+        n_lanes = 4 * len(self.intersections)
+        total_cars = self._sum
+        if n_lanes:
+            mean = self._sum / n_lanes
+            variance = self._sumsq / n_lanes - mean * mean
+        else:
+            variance = 0
+
+        i = self._h_idx
+        if i == self._h_cap:
+            self._h_cap *= 2
+            for k, v in self.history.items():
+                grown = np.empty(self._h_cap, v.dtype)
+                grown[:i] = v
+                self.history[k] = grown
+        self.history['step'][i] = self.step_count
+        self.history['total_congestion'][i] = total_cars
+        self.history['queue_variance'][i] = variance
         # [NEW FEATURE] Track CO2
-        self.history['total_co2'].append(current_co2)
+        self.history['total_co2'][i] = current_co2
+        self._h_idx = i + 1
 
     def get_throughput_potential(self, intersection_id, mode):
-        N = self.queue_lengths.get(f"N_{intersection_id}", 0)
-        S = self.queue_lengths.get(f"S_{intersection_id}", 0)
-        E = self.queue_lengths.get(f"E_{intersection_id}", 0)
-        W = self.queue_lengths.get(f"W_{intersection_id}", 0)
-        f = self.straight_fraction
+        row = self._row.get(intersection_id)
+        if row is None or not 1 <= mode <= 6:
+            return 0
+        return float(self._mode_coeff[mode - 1] @ self._Q[row])
+
+    def get_all_throughput(self):
+        # [PERFORMANCE] Throughput for every (intersection, mode) pair at
+        # once, shape (N, 6) - one matrix product instead of 6N calls.
+        Q = self._Q[:len(self.intersections)]
+        return Q @ self._mode_coeff.T
 
-        if mode == 1:   return (f * N) + (f * S)
-        elif mode == 2: return ((1-f) * N) + ((1-f) * S)
-        elif mode == 3: return (f * E) + (f * W)
-        elif mode == 4: return ((1-f) * E) + ((1-f) * W)
-        elif mode == 5: return N 
-        elif mode == 6: return E
-        else:           return 0
-        
     def get_history(self):
-        return self.history
\ No newline at end of file
+        # Views trimmed to the rows actually written - no copies
+        return {k: v[:self._h_idx] for k, v in self.history.items()}
@@ -7,77 +7,104 @@ class TrafficVisualizer:
         self.save_dir = "results"
         if not os.path.exists(self.save_dir):
             os.makedirs(self.save_dir)
+        # [PERFORMANCE] Figures and axes are created once (lazily, so no
+        # blank windows pop up for reports that never run) and cleared +
+        # redrawn on later calls, instead of paying plt.figure's canvas
+        # allocation and RC resolution on every redraw.
+        self._fig_diag = None
+        self._axes_diag = None
+        self._fig_cmp = None
+        self._ax_cmp = None
+        self._fig_pro = None
+        self._ax_pro = None
 
     # ... (Existing methods: generate_qaoa_diagnostics, generate_comparison_report, generate_before_after_bars) ...
 
     def generate_qaoa_diagnostics(self, history):
         print("\n=== Generating QAOA Diagnostics Graphs ===")
-        if not history['time']:
+        if len(history['time']) == 0:
              print("No data to visualize.")
              return
 
-        plt.figure(figsize=(18, 5))
+        if self._fig_diag is None:
+            self._fig_diag, self._axes_diag = plt.subplots(1, 3, figsize=(18, 5))
+        ax_q, ax_var, ax_co2 = self._axes_diag
 
         # Plot 1: Congestion
-        plt.subplot(1, 3, 1)
-        plt.plot(history['time'], history['total_queue'], color='tab:blue', label='Total Vehicles')
-        plt.xlabel("Step")
-        plt.ylabel("Count")
-        plt.title("Congestion Reduction")
-        plt.grid(True, alpha=0.3)
-        plt.legend()
+        ax_q.clear()
+        ax_q.plot(history['time'], history['total_queue'], color='tab:blue', label='Total Vehicles')
+        ax_q.set_xlabel("Step")
+        ax_q.set_ylabel("Count")
+        ax_q.set_title("Congestion Reduction")
+        ax_q.grid(True, alpha=0.3)
+        ax_q.legend()
 
         # Plot 2: Balancing
-        plt.subplot(1, 3, 2)
+        ax_var.clear()
         if 'queue_variance' in history:
-            plt.plot(history['time'], history['queue_variance'], color='tab:green', label='Variance')
-            plt.xlabel("Step")
-            plt.ylabel("Variance")
-            plt.title("Traffic Signal Balancing")
-            plt.grid(True, alpha=0.3)
-            plt.legend()
+            ax_var.plot(history['time'], history['queue_variance'], color='tab:green', label='Variance')
+            ax_var.set_xlabel("Step")
+            ax_var.set_ylabel("Variance")
+            ax_var.set_title("Traffic Signal Balancing")
+            ax_var.grid(True, alpha=0.3)
+            ax_var.legend()
 
         # Plot 3: CO2
-        plt.subplot(1, 3, 3)
+        ax_co2.clear()
         if 'total_co2' in history:
-            co2_g = [x / 1000 for x in history['total_co2']]
-            plt.plot(history['time'], co2_g, color='tab:red', label='CO2 Emissions')
-            plt.xlabel("Step")
-            plt.ylabel("Emissions (g/sec)")
-            plt.title("Environmental Impact (CO2)")
-            plt.grid(True, alpha=0.3)
-            plt.legend()
-
-        plt.tight_layout()
+            # [PERFORMANCE] One vectorized scale instead of a per-element
+            # Python loop that matplotlib would re-convert anyway.
+            co2_g = np.asarray(history['total_co2'], dtype=np.float32) * 1e-3
+            ax_co2.plot(history['time'], co2_g, color='tab:red', label='CO2 Emissions')
+            ax_co2.set_xlabel("Step")
+            ax_co2.set_ylabel("Emissions (g/sec)")
+            ax_co2.set_title("Environmental Impact (CO2)")
+            ax_co2.grid(True, alpha=0.3)
+            ax_co2.legend()
+
+        self._fig_diag.tight_layout()
         save_path = os.path.join(self.save_dir, "qaoa_diagnostics.png")
-        plt.savefig(save_path)
+        self._fig_diag.savefig(save_path)
         print(f"Diagnostics saved to: {save_path}")
-        plt.show(block=False) 
+        self._fig_diag.show()
         plt.pause(0.1)
 
     def generate_comparison_report(self, baseline_history, qaoa_history):
         print("\n=== BASELINE VS QAOA COMPARISON REPORT ===")
-        
+
         # Calculate comparison stats... (omitted for brevity)
 
-        min_len = min(len(baseline_history['time']), len(qaoa_history['time']))
-        plot_time = qaoa_history['time'][:min_len]
-        plot_base_q = baseline_history['total_queue'][:min_len]
-        plot_qaoa_q = qaoa_history['total_queue'][:min_len]
-
-        plt.figure(figsize=(12, 6))
-        plt.plot(plot_time, plot_base_q, color='grey', linestyle='--', label='Baseline')
-        plt.plot(plot_time, plot_qaoa_q, color='green', linewidth=2, label='QAOA Optimized')
-        plt.fill_between(plot_time, plot_base_q, plot_qaoa_q, color='green', alpha=0.1)
-
-        plt.title("Traffic Congestion Profile: Before (Baseline) vs After (QAOA)", fontsize=14)
-        plt.xlabel("Simulation Step (s)")
-        plt.ylabel("Total Queue Length")
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-        
+        # The runs sample adaptively (idle backoff), so equal indices are
+        # not equal timestamps across runs; align on the time axes instead
+        # by interpolating the baseline onto the QAOA run's timestamps.
+        base_t = np.asarray(baseline_history['time'])
+        base_q = np.asarray(baseline_history['total_queue'])
+        qaoa_t = np.asarray(qaoa_history['time'])
+        qaoa_q = np.asarray(qaoa_history['total_queue'])
+        if base_t.size == 0 or qaoa_t.size == 0:
+            print("No data to compare.")
+            return
+        keep = qaoa_t <= base_t[-1]
+        plot_time = qaoa_t[keep]
+        plot_qaoa_q = qaoa_q[keep]
+        plot_base_q = np.interp(plot_time, base_t, base_q)
+
+        if self._fig_cmp is None:
+            self._fig_cmp, self._ax_cmp = plt.subplots(figsize=(12, 6))
+        ax = self._ax_cmp
+        ax.clear()
+        ax.plot(plot_time, plot_base_q, color='grey', linestyle='--', label='Baseline')
+        ax.plot(plot_time, plot_qaoa_q, color='green', linewidth=2, label='QAOA Optimized')
+        ax.fill_between(plot_time, plot_base_q, plot_qaoa_q, color='green', alpha=0.1)
+
+        ax.set_title("Traffic Congestion Profile: Before (Baseline) vs After (QAOA)", fontsize=14)
+        ax.set_xlabel("Simulation Step (s)")
+        ax.set_ylabel("Total Queue Length")
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+
         save_path = os.path.join(self.save_dir, "comparison_result.png")
-        plt.savefig(save_path)
+        self._fig_cmp.savefig(save_path)
         plt.show(block=True)
 
     def generate_before_after_bars(self, baseline_stats, qaoa_stats):
@@ -89,29 +116,41 @@ class TrafficVisualizer:
         [NEW FEATURE] Proactive QAOA vs Reactive QAOA
         """
         print("\n=== PROACTIVE VS REACTIVE QAOA COMPARISON ===")
-        
-        react_avg = np.mean(reactive_history['total_queue']) if reactive_history['total_queue'] else 0
-        proact_avg = np.mean(proactive_history['total_queue']) if proactive_history['total_queue'] else 0
-        
+
+        react_q = np.asarray(reactive_history['total_queue'])
+        proact_q = np.asarray(proactive_history['total_queue'])
+        react_avg = react_q.mean() if react_q.size else 0
+        proact_avg = proact_q.mean() if proact_q.size else 0
+
         improvement = ((react_avg - proact_avg) / react_avg) * 100 if react_avg > 0 else 0
-        
-        min_len = min(len(reactive_history['time']), len(proactive_history['time']))
-        plot_time = proactive_history['time'][:min_len]
-        plot_react_q = reactive_history['total_queue'][:min_len]
-        plot_proact_q = proactive_history['total_queue'][:min_len]
-
-        plt.figure(figsize=(10, 5))
-        
-        plt.plot(plot_time, plot_react_q, color='red', linestyle='--', label='Reactive QAOA (No Lookahead)')
-        plt.plot(plot_time, plot_proact_q, color='blue', linewidth=2, label='Proactive QAOA (With Prediction)')
-        
-        plt.title(f"Proactive vs Reactive: Congestion Analysis (Proactive Gain: {improvement:.2f}%)")
-        plt.xlabel("Simulation Step (s)")
-        plt.ylabel("Total Queue Length")
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-        
+
+        # Same alignment caveat as the baseline comparison: pair the runs
+        # on timestamps, not indices, since sampling cadence adapts per run.
+        react_t = np.asarray(reactive_history['time'])
+        proact_t = np.asarray(proactive_history['time'])
+        if react_t.size == 0 or proact_t.size == 0:
+            print("No data to compare.")
+            return
+        keep = proact_t <= react_t[-1]
+        plot_time = proact_t[keep]
+        plot_proact_q = proact_q[keep]
+        plot_react_q = np.interp(plot_time, react_t, react_q)
+
+        if self._fig_pro is None:
+            self._fig_pro, self._ax_pro = plt.subplots(figsize=(10, 5))
+        ax = self._ax_pro
+        ax.clear()
+
+        ax.plot(plot_time, plot_react_q, color='red', linestyle='--', label='Reactive QAOA (No Lookahead)')
+        ax.plot(plot_time, plot_proact_q, color='blue', linewidth=2, label='Proactive QAOA (With Prediction)')
+
+        ax.set_title(f"Proactive vs Reactive: Congestion Analysis (Proactive Gain: {improvement:.2f}%)")
+        ax.set_xlabel("Simulation Step (s)")
+        ax.set_ylabel("Total Queue Length")
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+
         save_path = os.path.join(self.save_dir, "proactive_vs_reactive.png")
-        plt.savefig(save_path)
+        self._fig_pro.savefig(save_path)
         print(f"Proactive comparison graph saved to: {save_path}")
-        plt.show(block=True)
\ No newline at end of file
+        plt.show(block=True)